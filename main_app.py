@@ -1,9 +1,27 @@
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from streamlit_molstar import st_molstar_content
-from Bio.PDB import PDBParser, MMCIFParser
+from Bio.PDB import MMCIFParser
+from diskcache import Cache
 from io import StringIO
 import hashlib  # for stable unique keys per viewer
+import gc
+import re
+import zlib
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # optional: PDB B-factors fall back to the NumPy scan
+    njit = None
+
+try:
+    import gemmi
+except ImportError:  # optional: irregular mmCIF falls back to Biopython
+    gemmi = None
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -32,86 +50,406 @@ HIDE_ST_STYLE = """
             footer { visibility: hidden; height: 0%; }
             </style>
 """
+# Emitted on every full run: Streamlit drops elements a run doesn't re-emit, so
+# this can't be skipped behind a session flag. With st.fragment (1.37+), tab
+# interactions, Clear buttons included, rerun only their fragment and don't
+# reach this line; on older versions every interaction is a full run.
 st.markdown(HIDE_ST_STYLE, unsafe_allow_html=True)
 
 # --- Constants ---
 MAX_SEQUENCE_LENGTH = 400
 DEFAULT_SEQ = "PIAQIHILEGRSDEQKETLIREVSEAISRSLDAPLTSVRVIITEMAKGHFGIGGELASK"
+# 20 standard residues, X (unknown), B/Z (ambiguous), U (selenocysteine), O (pyrrolysine)
+AA_ALPHABET = frozenset("ACDEFGHIKLMNPQRSTVWYXBZUO")
+# Anything but ASCII letters: whitespace, digits, gaps, '*', non-ASCII characters
+SEQUENCE_JUNK_RE = re.compile(r'[^A-Za-z]')
 VIEWER_HEIGHT = "600px"
+ESMFOLD_CACHE_DIR = ".cache_esmfold"
+ESMFOLD_CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+STORED_COMPRESS_THRESHOLD = 256 * 1024  # bytes; larger structures are kept zlib-compressed in session_state
+# B-factor field (columns 61–66) of PDB ATOM/HETATM records; records too short to
+# have one match with an empty group, which fails float conversion (same rule as
+# the numba scanner: the structure has no readable pLDDT)
+PDB_B_FACTOR_RE = re.compile(rb'^(?:ATOM  |HETATM)(?:.{54}(.{1,6})|.{0,54}$)', re.M)
 
 # --- Helpers ---
-def do_rerun():
-    """Compatibility rerun for Streamlit >=1.27 (st.rerun) and older (experimental_rerun)."""
+def do_rerun(scope: str = "app"):
+    """
+    Compatibility rerun for Streamlit >=1.27 (st.rerun) and older (experimental_rerun).
+    scope="fragment" reruns only the calling fragment (Streamlit 1.37+), and
+    falls back to a full rerun when the current run isn't a fragment rerun.
+    """
     fn = getattr(st, "rerun", None) or getattr(st, "experimental_rerun", None)
-    if fn:
+    if not fn:
+        st.warning("Please update Streamlit to 1.27+ to enable rerun.")
+    elif scope == "app":
         fn()
     else:
-        st.warning("Please update Streamlit to 1.27+ to enable rerun.")
+        try:
+            fn(scope=scope)
+        except StreamlitAPIException:
+            fn()
+
+# Tab bodies run as fragments so interacting with one tab reruns only that tab
+# (st.fragment needs Streamlit 1.37+, experimental_fragment 1.33+); older
+# versions simply rerun the whole script.
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda fn: fn)
+# Scope for reruns triggered inside a tab. st.rerun(scope="fragment") arrived
+# together with st.fragment; with the plain-function fallback (or
+# experimental_fragment, whose st.rerun has no scope) the whole app reruns.
+TAB_RERUN_SCOPE = "fragment" if hasattr(st, "fragment") else "app"
+
+def _sum_pdb_b_factors(buf):
+    """
+    Sum the B-factor field (columns 61–66) of ATOM/HETATM records in a uint8 buffer.
+    Returns (total, count); count is -1 if a field is not a plain decimal number.
+    Written as a byte loop so numba can compile it.
+    """
+    total = 0.0
+    count = 0
+    n = buf.size
+    i = 0
+    while i < n:
+        j = i
+        while j < n and buf[j] != 10:  # '\n'
+            j += 1
+        line_end = j - 1 if j > i and buf[j - 1] == 13 else j  # drop '\r'
+
+        is_record = line_end - i >= 6 and (
+            # b'ATOM  '
+            (buf[i] == 65 and buf[i + 1] == 84 and buf[i + 2] == 79 and buf[i + 3] == 77
+             and buf[i + 4] == 32 and buf[i + 5] == 32)
+            # b'HETATM'
+            or (buf[i] == 72 and buf[i + 1] == 69 and buf[i + 2] == 84 and buf[i + 3] == 65
+                and buf[i + 4] == 84 and buf[i + 5] == 77)
+        )
+        if is_record:
+            k = i + 60
+            end = min(i + 66, line_end)
+            while k < end and buf[k] == 32:
+                k += 1
+            sign = 1.0
+            if k < end and (buf[k] == 45 or buf[k] == 43):  # '-' / '+'
+                if buf[k] == 45:
+                    sign = -1.0
+                k += 1
+            value = 0.0
+            frac = -1.0  # < 0 until the decimal point is seen
+            seen_digit = False
+            while k < end and buf[k] != 32:
+                c = buf[k]
+                if 48 <= c <= 57:
+                    seen_digit = True
+                    if frac < 0:
+                        value = value * 10.0 + (c - 48)
+                    else:
+                        frac /= 10.0
+                        value += (c - 48) * frac
+                elif c == 46 and frac < 0:  # '.'
+                    frac = 1.0
+                else:
+                    return 0.0, -1
+                k += 1
+            while k < end:
+                if buf[k] != 32:
+                    return 0.0, -1
+                k += 1
+            if not seen_digit:
+                return 0.0, -1
+            total += sign * value
+            count += 1
+        i = j + 1
+    return total, count
+
+@st.cache_resource
+def get_pdb_b_factor_kernel():
+    """
+    Numba-compiled _sum_pdb_b_factors, or None if numba is not installed.
+    Compiled once per server process; no on-disk cache=True, since reloading a
+    cached function from the Streamlit script would re-import (and re-run) it.
+    """
+    if njit is None:
+        return None
+    return njit(_sum_pdb_b_factors)
+
+def _plddt_percent(avg_plddt: float) -> float:
+    """Normalize to 0–100 if values are in 0–1 range."""
+    if avg_plddt <= 1.0:
+        avg_plddt *= 100
+    return avg_plddt
 
-def get_average_plddt(structure_str: str, fmt: str) -> float | None:
+def _cif_b_factors(data: bytes) -> np.ndarray | None:
     """
-    Calculate average pLDDT from PDB or CIF string using Biopython.
+    Read the _atom_site.B_iso_or_equiv column straight out of mmCIF bytes.
+    Returns None if there is no _atom_site loop or a row does not split cleanly
+    on whitespace, so the caller can fall back to a full parser.
+    """
+    lines = data.splitlines()
+    start = next(
+        (i for i, line in enumerate(lines)
+         if line.startswith(b'_atom_site.') and i > 0 and lines[i - 1].strip() == b'loop_'),
+        None
+    )
+    if start is None:
+        return None
+
+    end = start
+    while end < len(lines) and lines[end].startswith(b'_atom_site.'):
+        end += 1
+    headers = [line.strip() for line in lines[start:end]]
+    if b'_atom_site.B_iso_or_equiv' not in headers:
+        return None
+    col = headers.index(b'_atom_site.B_iso_or_equiv')
+    n_cols = len(headers)
+
+    def values():
+        for line in lines[end:]:
+            if line.startswith((b'#', b'_', b'loop_', b'data_')):
+                return
+            tokens = line.split()
+            if not tokens:
+                continue
+            if len(tokens) != n_cols:
+                raise ValueError("irregular _atom_site row")
+            yield tokens[col]
+
+    try:
+        return np.fromiter(values(), dtype=np.float64)
+    except ValueError:
+        return None
+
+def _gemmi_b_factors(data: bytes) -> np.ndarray | None:
+    """
+    Read the _atom_site.B_iso_or_equiv column with gemmi's CIF tokenizer, which
+    handles quoted and multi-line values without building a structure.
+    Returns None if gemmi is not installed or the column cannot be read.
+    """
+    if gemmi is None:
+        return None
+    try:
+        block = gemmi.cif.read_string(data.decode("utf-8", errors="replace")).sole_block()
+        column = block.find_values('_atom_site.B_iso_or_equiv')
+    except (RuntimeError, ValueError):
+        return None
+    if len(column) == 0:
+        return None
+    b_factors = np.fromiter(map(gemmi.cif.as_number, column), dtype=np.float64)
+    # as_number() gives NaN for missing values ('?' / '.'); treat them as unreadable
+    if np.isnan(b_factors).any():
+        return None
+    return b_factors
+
+@st.cache_data(show_spinner=False, ttl=24 * 60 * 60, max_entries=32)
+def get_average_plddt(_structure_str: str | bytes, fmt: str, digest: str) -> float | None:
+    """
+    Calculate average pLDDT from PDB or CIF string.
+    PDB is scanned line by line (numba-compiled if available); CIF reads the
+    _atom_site B-factor column, falling back to gemmi (if installed) and then
+    Biopython for loops that cannot be split on whitespace.
     Automatically detects 0–1 or 0–100 scale.
 
     Parameters
     ----------
-    structure_str : str
-        Structure content in PDB or mmCIF format.
+    _structure_str : str or bytes
+        Structure content in PDB or mmCIF format (not hashed by the cache).
+        Scanned as bytes; str input is encoded once.
     fmt : str
         'pdb' or 'cif'
+    digest : str
+        Content fingerprint from content_fingerprint(); used as the cache key.
     """
+    data = _structure_str.encode("utf-8") if isinstance(_structure_str, str) else _structure_str
     fmt = fmt.lower()
     if fmt == 'pdb':
-        parser = PDBParser(QUIET=True)
+        # Fixed-column format: read the B-factor field straight off ATOM/HETATM
+        # records instead of building a full Biopython structure.
+        kernel = get_pdb_b_factor_kernel()
+        if kernel is not None:
+            total, n = kernel(np.frombuffer(data, dtype=np.uint8))
+            if n <= 0:
+                return None
+            return _plddt_percent(total / n)
+
+        try:
+            b_factors = np.fromiter(PDB_B_FACTOR_RE.findall(data), dtype=np.float64)
+        except ValueError:
+            return None
     elif fmt == 'cif':
-        parser = MMCIFParser(QUIET=True)
+        b_factors = _cif_b_factors(data)
+        if b_factors is None:
+            # Irregular _atom_site loop (quoted or multi-line values): use a real CIF tokenizer
+            b_factors = _gemmi_b_factors(data)
+        if b_factors is None:
+            parser = MMCIFParser(QUIET=True)
+            handle = StringIO(data.decode("utf-8", errors="replace"))
+            # Building the structure allocates many small objects; keep the cyclic
+            # GC from repeatedly scanning them mid-parse
+            gc_was_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                structure = parser.get_structure("model", handle)
+            except Exception:
+                return None
+            finally:
+                if gc_was_enabled:
+                    gc.enable()
+            b_factors = np.fromiter((atom.bfactor for atom in structure.get_atoms()), dtype=np.float64)
     else:
         raise ValueError("Format must be 'pdb' or 'cif'")
 
-    handle = StringIO(structure_str)
-    try:
-        structure = parser.get_structure("model", handle)
-    except Exception:
+    if b_factors.size == 0:
         return None
+    return _plddt_percent(float(b_factors.mean()))
 
-    b_factors = [atom.bfactor for atom in structure.get_atoms()]
-    if not b_factors:
-        return None
+def normalize_sequence(sequence: str) -> str:
+    """
+    Canonical form of a pasted sequence: FASTA header lines are dropped, the
+    rest is stripped of everything but ASCII letters and upper-cased. Wrapped,
+    numbered or lower-case variants of the same sequence share one ESMFold
+    cache entry, and the result is plain ASCII.
+    """
+    lines = (line for line in sequence.splitlines() if not line.lstrip().startswith('>'))
+    return SEQUENCE_JUNK_RE.sub('', "\n".join(lines)).upper()
 
-    avg_plddt = sum(b_factors) / len(b_factors)
-    # Normalize to 0–100 if values are in 0–1 range
-    if avg_plddt <= 1.0:
-        avg_plddt *= 100
-    return avg_plddt
+def content_fingerprint(content: str | bytes, fmt: str) -> str:
+    """Return a 48-bit BLAKE2b digest of format + content."""
+    # Feed the hash incrementally so the payload isn't copied into a "fmt:content" buffer
+    h = hashlib.blake2b(digest_size=6)
+    h.update(fmt.encode())
+    h.update(b":")
+    h.update(content.encode("utf-8") if isinstance(content, str) else content)
+    return h.hexdigest()
 
-def make_viewer_key(prefix: str, content: str, fmt: str) -> str:
+def pack_content(content: str | bytes) -> str | bytes:
+    """
+    Prepare structure text for session_state. Payloads above
+    STORED_COMPRESS_THRESHOLD are zlib-compressed (returned as bytes), since
+    session state lives as long as the browser session; smaller ones stay str.
+    Raises UnicodeDecodeError for bytes that aren't UTF-8, whatever their size,
+    so unpack_content() can't fail later.
+    """
+    if isinstance(content, str):
+        text, data = content, content.encode("utf-8")
+    else:
+        text, data = content.decode("utf-8"), content
+    if len(data) > STORED_COMPRESS_THRESHOLD:
+        return zlib.compress(data, 1)
+    return text
+
+def _unpacked_payload(stored: str | bytes) -> str | bytes:
+    """Structure text from pack_content(), as str or decompressed UTF-8 bytes."""
+    return zlib.decompress(stored) if isinstance(stored, bytes) else stored
+
+def unpack_content(stored: str | bytes) -> str:
+    """Structure text from pack_content(), decompressed for display."""
+    payload = _unpacked_payload(stored)
+    return payload.decode("utf-8") if isinstance(payload, bytes) else payload
+
+def _score_structure(stored: str | bytes, fmt: str) -> tuple[str, float | None]:
+    """Hash a stored structure and compute its average pLDDT (cached by digest)."""
+    payload = _unpacked_payload(stored)
+    digest = content_fingerprint(payload, fmt)
+    return digest, get_average_plddt(payload, fmt, digest)
+
+def viewer_metadata(stored: str | bytes, fmt: str) -> tuple[str, float | None]:
+    """
+    Return (digest, average pLDDT) for a structure shown in one of the tabs,
+    given the packed value kept in session_state.
+    Results are remembered per session by object identity in a small LRU, so a
+    structure kept in session_state is hashed and scored once, whichever tab
+    renders it.
+    """
+    cache = st.session_state.setdefault("_meta_cache", {})
+    cache_key = (id(stored), fmt)
+    hit = cache.pop(cache_key, None)
+    # The entry holds a reference to the stored value, so its id() can't be recycled
+    # and an identity check is enough to short-circuit the same blob re-rendered
+    if hit is None or hit[0] is not stored:
+        hit = (stored, *_score_structure(stored, fmt))
+    # Re-insert as most recent and drop the oldest (dicts preserve insertion order)
+    cache[cache_key] = hit
+    while len(cache) > 8:
+        cache.pop(next(iter(cache)))
+    return hit[1], hit[2]
+
+def forget_metadata(stored: str | bytes | None) -> None:
+    """
+    Drop the viewer_metadata entry for a payload that is leaving session_state,
+    so the cache's reference doesn't keep a cleared or replaced structure alive.
+    """
+    cache = st.session_state.get("_meta_cache")
+    if not cache or stored is None:
+        return
+    for cache_key in [k for k, hit in cache.items() if hit[0] is stored]:
+        del cache[cache_key]
+
+def make_viewer_key(prefix: str, digest: str, fmt: str) -> str:
     """
     Make a stable unique key for the Mol* component.
-    Uses MD5 of content + format so identical structures across tabs don't collide.
+    Built from the content fingerprint so identical structures across tabs don't collide.
     """
-    digest = hashlib.md5((fmt + ":" + content).encode("utf-8")).hexdigest()[:12]
     return f"molstar-{prefix}-{fmt}-{digest}"
 
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """
+    Shared HTTP session so connections (and TLS handshakes) to ESMFold and
+    AlphaFold DB are reused across requests. Cached as a resource because the
+    script body is re-executed on every rerun.
+    """
+    retry = Retry(
+        total=3,
+        read=0,  # a timed-out response is slow, not lost; don't wait through it again
+        backoff_factor=0.3,
+        status_forcelist=[502, 503, 504],
+        # Default allowed_methods: the ESMFold POST is never resent, since a
+        # 504 or timeout there means the fold itself was too slow
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return session
+
+def afdb_url(uniprot_id: str) -> str:
+    """AlphaFold DB mmCIF URL for a UniProt accession."""
+    return f"https://alphafold.ebi.ac.uk/files/AF-{uniprot_id}-F1-model_v4.cif"
+
+@st.cache_resource
+def get_esmfold_disk_cache() -> Cache:
+    """On-disk cache of ESMFold predictions that survives server restarts."""
+    return Cache(ESMFOLD_CACHE_DIR)
+
 @st.cache_data(show_spinner="Predicting structure with ESMFold...")
 def fold_protein(sequence: str) -> str | None:
     """
     Call the ESMFold API to predict a protein structure in PDB format.
     Returns the PDB content as a string or None if an error occurs.
+    st.cache_data keeps results in memory; predictions are also stored on disk
+    so identical sequences skip the API after a restart.
     """
+    disk_cache = get_esmfold_disk_cache()
+    cache_key = hashlib.sha1(sequence.encode("utf-8")).hexdigest()
+    cached = disk_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     headers = {'Content-Type': 'application/x-www-form-urlencoded'}
     try:
-        response = requests.post(
+        response = get_http_session().post(
             'https://api.esmatlas.com/foldSequence/v1/pdb/',
             headers=headers,
             data=sequence,
             timeout=60
         )
         response.raise_for_status()
-        return response.content.decode('utf-8')
     except requests.exceptions.RequestException as e:
         st.error(f"API Error: {e}")
         return None
 
+    pdb_content = response.content.decode('utf-8')
+    disk_cache.set(cache_key, pdb_content, expire=ESMFOLD_CACHE_TTL)
+    return pdb_content
+
 # --- App Title ---
 st.title("🧬 ProViewer")
 
@@ -119,7 +457,8 @@ st.title("🧬 ProViewer")
 tab_predict, tab_upload, tab_fetch = st.tabs(["🔮 Predict", "📁 Upload", "📦 AlphaFold DB"])
 
 # --- Predict Tab ---
-with tab_predict:
+@fragment
+def predict_tab():
     st.subheader("Predict Protein Structure from Sequence")
 
     # Place the input field and submit button side-by-side
@@ -127,12 +466,12 @@ with tab_predict:
         # Changed the column ratio to push the button further to the right
         col_text, col_btn = st.columns([8, 1], vertical_alignment="top")
         with col_text:
-            sequence = st.text_area(
+            sequence = normalize_sequence(st.text_area(
                 "Amino Acid Sequence",
                 value=DEFAULT_SEQ,
                 height=80,
                 key="predict_sequence"  # keep input across reruns
-            ).strip()
+            ))
             st.caption(f"Length: {len(sequence)} / {MAX_SEQUENCE_LENGTH} characters")
         with col_btn:
             # Add vertical space to align with the text area label
@@ -144,16 +483,19 @@ with tab_predict:
             st.warning("Please enter a sequence.")
         elif len(sequence) > MAX_SEQUENCE_LENGTH:
             st.error(f"Sequence too long: max {MAX_SEQUENCE_LENGTH} characters.")
+        elif invalid := set(sequence) - AA_ALPHABET:
+            st.error(f"Invalid residue codes: {', '.join(sorted(invalid))}. Use one-letter amino acid codes.")
         else:
             pdb_content = fold_protein(sequence)
             if pdb_content:
-                st.session_state.predicted_content = pdb_content
+                forget_metadata(st.session_state.get("predicted_content"))
+                st.session_state.predicted_content = pack_content(pdb_content)
 
     if "predicted_content" in st.session_state:
-        pdb_to_show = st.session_state.predicted_content
+        digest, avg_plddt = viewer_metadata(st.session_state.predicted_content, 'pdb')
+        pdb_to_show = unpack_content(st.session_state.predicted_content)
         col1, col2 = st.columns([1, 4])
         with col1:
-            avg_plddt = get_average_plddt(pdb_to_show, 'pdb')
             if avg_plddt is not None:
                 st.metric("Avg. pLDDT", f"{avg_plddt:.2f}")
             st.download_button(
@@ -165,34 +507,48 @@ with tab_predict:
             )
             if st.button("🧹 Clear", key="clear_predict",
                          help="Clear the predicted structure view (input is kept)."):
-                st.session_state.pop("predicted_content", None)
-                do_rerun()
+                forget_metadata(st.session_state.pop("predicted_content", None))
+                do_rerun(TAB_RERUN_SCOPE)
         with col2:
             st_molstar_content(
                 pdb_to_show,
                 file_format='pdb',
                 height=VIEWER_HEIGHT,
-                key=make_viewer_key("predict", pdb_to_show, "pdb")
+                key=make_viewer_key("predict", digest, "pdb")
             )
 
+with tab_predict:
+    predict_tab()
+
 # --- Upload Tab ---
-with tab_upload:
+@fragment
+def upload_tab():
     st.subheader("Upload and View Protein Structure")
     uploaded = st.file_uploader("Upload PDB or CIF File", type=['pdb', 'cif'], key="file_uploader")
 
-    # Persist uploaded content and format
-    if uploaded:
-        st.session_state.uploaded_content = uploaded.getvalue().decode('utf-8')
-        st.session_state.uploaded_format = uploaded.name.split('.')[-1].lower()
+    # Persist uploaded content and format; only store when a new file arrives,
+    # since the uploader keeps returning the same file on every rerun
+    if uploaded and uploaded.file_id != st.session_state.get("uploaded_file_id"):
+        try:
+            packed = pack_content(uploaded.getvalue())
+            forget_metadata(st.session_state.get("uploaded_content"))
+            st.session_state.uploaded_content = packed
+            st.session_state.uploaded_format = uploaded.name.split('.')[-1].lower()
+            st.session_state.uploaded_file_id = uploaded.file_id
+        except UnicodeDecodeError:
+            # Don't keep showing a previous upload under this error
+            forget_metadata(st.session_state.pop("uploaded_content", None))
+            st.session_state.pop("uploaded_format", None)
+            st.session_state.pop("uploaded_file_id", None)
+            st.error(f"Could not read {uploaded.name}: the file is not UTF-8 text.")
 
     # Show uploaded structure and controls if present
     if "uploaded_content" in st.session_state:
-        content = st.session_state.get("uploaded_content")
         fmt = st.session_state.get("uploaded_format")
-
+        digest, avg = viewer_metadata(st.session_state.get("uploaded_content"), fmt)
+        content = unpack_content(st.session_state.get("uploaded_content"))
         col1, col2 = st.columns([1, 4])
         with col1:
-            avg = get_average_plddt(content, fmt)
             if avg is not None:
                 st.metric("Avg. pLDDT", f"{avg:.2f}")
             if st.button(
@@ -202,21 +558,26 @@ with tab_upload:
                 disabled=False
             ):
                 # Clear stored data
-                st.session_state.pop("uploaded_content", None)
+                forget_metadata(st.session_state.pop("uploaded_content", None))
                 st.session_state.pop("uploaded_format", None)
+                st.session_state.pop("uploaded_file_id", None)
                 # IMPORTANT: also reset the uploader widget state
                 st.session_state.pop("file_uploader", None)
-                do_rerun()
+                do_rerun(TAB_RERUN_SCOPE)
         with col2:
             st_molstar_content(
                 content,
                 file_format=fmt,
                 height=VIEWER_HEIGHT,
-                key=make_viewer_key("upload", content, fmt)
+                key=make_viewer_key("upload", digest, fmt)
             )
 
+with tab_upload:
+    upload_tab()
+
 # --- AlphaFold DB Tab ---
-with tab_fetch:
+@fragment
+def afdb_tab():
     st.subheader("Fetch Structure from AlphaFold DB")
 
     # Use a form to allow submission with the Enter key
@@ -235,24 +596,24 @@ with tab_fetch:
             submit_fetch = st.form_submit_button("Fetch")
 
     if submit_fetch and uniprot_id:
-        url = f"https://alphafold.ebi.ac.uk/files/AF-{uniprot_id}-F1-model_v4.cif"
         try:
-            r = requests.get(url, timeout=30)
+            r = get_http_session().get(afdb_url(uniprot_id), timeout=30)
             r.raise_for_status()
+            packed = pack_content(r.content)
+            forget_metadata(st.session_state.get("af_structure", {}).get("content"))
             st.session_state.af_structure = {
-                "content": r.content.decode(),
+                "content": packed,
                 "id": uniprot_id
             }
-        except requests.RequestException:
+        except (requests.RequestException, UnicodeDecodeError):
             st.error(f"Failed to fetch structure for {uniprot_id}. Please check the UniProt ID and try again.")
 
     if "af_structure" in st.session_state:
-        content = st.session_state.af_structure["content"]
         id_ = st.session_state.af_structure["id"]
-
+        digest, avg = viewer_metadata(st.session_state.af_structure["content"], 'cif')
+        content = unpack_content(st.session_state.af_structure["content"])
         col1, col2 = st.columns([1, 4])
         with col1:
-            avg = get_average_plddt(content, 'cif')
             if avg is not None:
                 st.metric("Avg. pLDDT", f"{avg:.2f}")
             st.download_button(
@@ -264,12 +625,15 @@ with tab_fetch:
             )
             if st.button("🧹 Clear", key="clear_afdb",
                          help="Clear the fetched AlphaFold structure view (UniProt ID input is kept)."):
-                st.session_state.pop("af_structure", None)
-                do_rerun()
+                forget_metadata(st.session_state.pop("af_structure", {}).get("content"))
+                do_rerun(TAB_RERUN_SCOPE)
         with col2:
             st_molstar_content(
                 content,
                 file_format='cif',
                 height=VIEWER_HEIGHT,
-                key=make_viewer_key("afdb", content, "cif")
-            )
\ No newline at end of file
+                key=make_viewer_key("afdb", digest, "cif")
+            )
+
+with tab_fetch:
+    afdb_tab()